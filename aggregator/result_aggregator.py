@@ -4,11 +4,86 @@ Result Aggregator
 Combines results from multiple scanners into unified report
 """
 
+import io
 import json
 import os
+import sys
+from collections import Counter
 from datetime import datetime
 from pathlib import Path
 
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def loads_json(data):
+    """Parse JSON text or bytes (with orjson when it is installed)"""
+    return orjson.loads(data) if orjson else json.loads(data)
+
+
+def load_json(filepath):
+    """Parse a whole JSON file (with orjson when it is installed)"""
+    with open(filepath, 'rb') as f:
+        return loads_json(f.read())
+
+
+def dump_json(obj):
+    """Serialize obj to compact UTF-8 JSON bytes (with orjson when it is installed)"""
+    return orjson.dumps(obj) if orjson else json.dumps(obj).encode()
+
+
+def iter_json_items(filepath, prefix):
+    """
+    Yield the values found at prefix in a JSON file
+    
+    Uses ijson to stream the file when it is installed, so only one item is
+    in memory at a time; otherwise falls back to load_json.
+    
+    Args:
+        filepath: JSON file to read
+        prefix: ijson-style path, e.g. 'results.item' ('item' = list element)
+    """
+    if not ijson:
+        yield from _walk_json(load_json(filepath), prefix.split('.') if prefix else [])
+        return
+    with open(filepath, 'rb') as f:
+        yield from ijson.items(f, prefix, use_float=True)
+
+
+def _walk_json(node, parts):
+    """Fallback for iter_json_items on an already-parsed document"""
+    if not parts:
+        yield node
+    elif parts[0] == 'item':
+        if isinstance(node, list):
+            for child in node:
+                yield from _walk_json(child, parts[1:])
+    elif isinstance(node, dict) and parts[0] in node:
+        yield from _walk_json(node[parts[0]], parts[1:])
+
+
+# Unified severity buckets, highest first
+SEVERITY_LEVELS = ('CRITICAL', 'HIGH', 'MEDIUM', 'LOW')
+
+# Semgrep severities that count towards the unified severity buckets
+SEMGREP_SEVERITY_MAP = {
+    'ERROR': 'CRITICAL',
+    'WARNING': 'MEDIUM'
+}
+
+SCANNER_TYPES = {
+    'Semgrep': 'SAST (Code Analysis)',
+    'Trivy': 'SCA (Dependency Analysis)',
+    'TruffleHog': 'Secret Detection'
+}
+
 
 class ResultAggregator:
     """Aggregates results from multiple security scanners"""
@@ -16,31 +91,24 @@ class ResultAggregator:
     def __init__(self, scan_dir="data/scans"):
         """Initialize aggregator"""
         self.scan_dir = scan_dir
-        self.semgrep_results = None
-        self.trivy_results = None
-        self.trufflehog_results = None
+        self.semgrep_file = None
+        self.trivy_file = None
+        self.trufflehog_file = None
+        self._summary_cache = None
         
     def load_latest_results(self):
-        """Load the most recent scan results from each scanner"""
+        """Locate the most recent scan results from each scanner"""
         scan_path = Path(self.scan_dir)
+        self._summary_cache = None
         
-        # Find latest Semgrep scan
-        semgrep_files = sorted(scan_path.glob("semgrep_scan_*.json"), reverse=True)
-        if semgrep_files:
-            with open(semgrep_files[0], 'r') as f:
-                self.semgrep_results = json.load(f)
+        # Find latest Semgrep scan (names are timestamped)
+        self.semgrep_file = max(scan_path.glob("semgrep_scan_*.json"), default=None)
         
         # Find latest Trivy scan
-        trivy_files = sorted(scan_path.glob("trivy_scan_*.json"), reverse=True)
-        if trivy_files:
-            with open(trivy_files[0], 'r') as f:
-                self.trivy_results = json.load(f)
+        self.trivy_file = max(scan_path.glob("trivy_scan_*.json"), default=None)
         
         # Find latest TruffleHog scan
-        trufflehog_files = sorted(scan_path.glob("trufflehog_scan_*.json"), reverse=True)
-        if trufflehog_files:
-            with open(trufflehog_files[0], 'r') as f:
-                self.trufflehog_results = json.load(f)
+        self.trufflehog_file = max(scan_path.glob("trufflehog_scan_*.json"), default=None)
     
     def get_unified_summary(self):
         """Create unified summary from all scanners"""
@@ -49,122 +117,154 @@ class ResultAggregator:
             'scanners_used': [],
             'total_findings': 0,
             'by_scanner': {},
-            'by_severity': {
-                'CRITICAL': 0,
-                'HIGH': 0,
-                'MEDIUM': 0,
-                'LOW': 0
-            },
+            'by_severity': dict.fromkeys(SEVERITY_LEVELS, 0),
             'by_category': {}
         }
         
-        # Semgrep results
-        if self.semgrep_results:
-            semgrep_count = len(self.semgrep_results.get('results', []))
+        # Semgrep results (streamed - only severities are needed)
+        if self.semgrep_file:
+            severity_counts = Counter(
+                finding.get('extra', {}).get('severity')
+                for finding in iter_json_items(self.semgrep_file, 'results.item')
+            )
+            semgrep_count = sum(severity_counts.values())
+            
+            # Count by severity (Semgrep uses ERROR/WARNING)
+            for severity, level in SEMGREP_SEVERITY_MAP.items():
+                summary['by_severity'][level] += severity_counts[severity]
+            
             summary['scanners_used'].append('Semgrep')
             summary['by_scanner']['Semgrep'] = {
                 'findings': semgrep_count,
-                'type': 'SAST (Code Analysis)'
+                'type': SCANNER_TYPES['Semgrep']
             }
             summary['total_findings'] += semgrep_count
-            
-            # Count by severity (Semgrep uses ERROR/WARNING)
-            for finding in self.semgrep_results.get('results', []):
-                severity = finding.get('extra', {}).get('severity', 'MEDIUM')
-                if severity == 'ERROR':
-                    summary['by_severity']['CRITICAL'] += 1
-                elif severity == 'WARNING':
-                    summary['by_severity']['MEDIUM'] += 1
         
         # Trivy results
-        if self.trivy_results:
-            trivy_count = 0
-            if 'Results' in self.trivy_results:
-                for result in self.trivy_results['Results']:
-                    if 'Vulnerabilities' in result and result['Vulnerabilities']:
-                        trivy_count += len(result['Vulnerabilities'])
-                        
-                        # Count by severity
-                        for vuln in result['Vulnerabilities']:
-                            severity = vuln.get('Severity', 'UNKNOWN')
-                            if severity in summary['by_severity']:
-                                summary['by_severity'][severity] += 1
+        if self.trivy_file:
+            severity_counts = Counter(
+                vuln.get('Severity', 'UNKNOWN')
+                for vuln in iter_json_items(self.trivy_file, 'Results.item.Vulnerabilities.item')
+            )
+            trivy_count = sum(severity_counts.values())
+            
+            # Count by severity (UNKNOWN etc. have no bucket)
+            for level in SEVERITY_LEVELS:
+                summary['by_severity'][level] += severity_counts[level]
             
             summary['scanners_used'].append('Trivy')
             summary['by_scanner']['Trivy'] = {
                 'findings': trivy_count,
-                'type': 'SCA (Dependency Analysis)'
+                'type': SCANNER_TYPES['Trivy']
             }
             summary['total_findings'] += trivy_count
         
         # TruffleHog results
-        if self.trufflehog_results:
-            trufflehog_count = len(self.trufflehog_results) if isinstance(self.trufflehog_results, list) else 0
+        if self.trufflehog_file:
+            trufflehog_count = sum(1 for _ in iter_json_items(self.trufflehog_file, 'item'))
             summary['scanners_used'].append('TruffleHog')
             summary['by_scanner']['TruffleHog'] = {
                 'findings': trufflehog_count,
-                'type': 'Secret Detection'
+                'type': SCANNER_TYPES['TruffleHog']
             }
             summary['total_findings'] += trufflehog_count
             summary['by_severity']['HIGH'] += trufflehog_count  # Secrets are always HIGH
         
         return summary
     
+    def _get_summary(self):
+        """Unified summary, computed once per load_latest_results()"""
+        if self._summary_cache is None:
+            self._summary_cache = self.get_unified_summary()
+        return self._summary_cache
+    
     def print_unified_report(self):
         """Print beautiful unified report"""
-        summary = self.get_unified_summary()
+        summary = self._get_summary()
+        
+        # Build the report in memory and write it in one go
+        buf = io.StringIO()
+        w = buf.write
         
-        print("\n" + "="*80)
-        print("📊 SECUREFLOW UNIFIED SECURITY REPORT")
-        print("="*80)
+        w("\n" + "="*80 + "\n")
+        w("📊 SECUREFLOW UNIFIED SECURITY REPORT\n")
+        w("="*80 + "\n")
         
-        print(f"\n🕐 Scan Time: {summary['scan_time']}")
-        print(f"🔧 Scanners Used: {', '.join(summary['scanners_used'])}")
+        w(f"\n🕐 Scan Time: {summary['scan_time']}\n")
+        w(f"🔧 Scanners Used: {', '.join(summary['scanners_used'])}\n")
         
-        print(f"\n📈 OVERALL SUMMARY:")
-        print(f"   Total Security Findings: {summary['total_findings']}")
+        w(f"\n📈 OVERALL SUMMARY:\n")
+        w(f"   Total Security Findings: {summary['total_findings']}\n")
         
-        print(f"\n🎯 By Severity:")
-        print(f"   🔴 CRITICAL: {summary['by_severity']['CRITICAL']}")
-        print(f"   🟠 HIGH:     {summary['by_severity']['HIGH']}")
-        print(f"   🟡 MEDIUM:   {summary['by_severity']['MEDIUM']}")
-        print(f"   🟢 LOW:      {summary['by_severity']['LOW']}")
+        w(f"\n🎯 By Severity:\n")
+        w(f"   🔴 CRITICAL: {summary['by_severity']['CRITICAL']}\n")
+        w(f"   🟠 HIGH:     {summary['by_severity']['HIGH']}\n")
+        w(f"   🟡 MEDIUM:   {summary['by_severity']['MEDIUM']}\n")
+        w(f"   🟢 LOW:      {summary['by_severity']['LOW']}\n")
         
-        print(f"\n🔍 By Scanner:")
+        w(f"\n🔍 By Scanner:\n")
         for scanner, data in summary['by_scanner'].items():
-            print(f"   {scanner} ({data['type']}): {data['findings']} findings")
+            w(f"   {scanner} ({data['type']}): {data['findings']} findings\n")
         
-        print("\n" + "="*80)
-        print("💡 RECOMMENDATIONS:")
+        w("\n" + "="*80 + "\n")
+        w("💡 RECOMMENDATIONS:\n")
         
         if summary['by_severity']['CRITICAL'] > 0:
-            print(f"   ⚠️  {summary['by_severity']['CRITICAL']} CRITICAL issues require IMMEDIATE attention!")
+            w(f"   ⚠️  {summary['by_severity']['CRITICAL']} CRITICAL issues require IMMEDIATE attention!\n")
         if summary['by_severity']['HIGH'] > 0:
-            print(f"   🟠 {summary['by_severity']['HIGH']} HIGH severity issues should be fixed soon")
+            w(f"   🟠 {summary['by_severity']['HIGH']} HIGH severity issues should be fixed soon\n")
         if summary['by_severity']['MEDIUM'] > 0:
-            print(f"   🟡 {summary['by_severity']['MEDIUM']} MEDIUM issues - plan to address")
+            w(f"   🟡 {summary['by_severity']['MEDIUM']} MEDIUM issues - plan to address\n")
         
-        print("\n📁 Detailed results available in: data/scans/")
-        print("="*80 + "\n")
+        w("\n📁 Detailed results available in: data/scans/\n")
+        w("="*80 + "\n\n")
+        
+        sys.stdout.write(buf.getvalue())
+        sys.stdout.flush()
     
     def save_unified_report(self, filename=None):
-        """Save unified report to JSON"""
+        """
+        Save unified report as JSON Lines
+        
+        The first line is the summary. Every following line is one finding,
+        {"scanner": ..., "finding": {...}} (Trivy lines also carry the
+        "target" the vulnerability was found in), so readers can take just
+        the summary or filter findings without loading the whole report.
+        """
         if not filename:
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"unified_report_{timestamp}.json"
+            filename = f"unified_report_{timestamp}.jsonl"
         
         filepath = os.path.join(self.scan_dir, filename)
         
-        summary = self.get_unified_summary()
-        summary['semgrep_findings'] = self.semgrep_results.get('results', []) if self.semgrep_results else []
-        summary['trivy_findings'] = self.trivy_results if self.trivy_results else {}
-        summary['trufflehog_findings'] = self.trufflehog_results if self.trufflehog_results else []
+        summary = self._get_summary()
         
-        with open(filepath, 'w') as f:
-            json.dump(summary, f, indent=2)
+        # Written beside the target and renamed over it, so the dashboard
+        # never reads a half-written report
+        tmp_path = filepath + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(dump_json(summary) + b'\n')
+            for record in self._iter_findings():
+                f.write(dump_json(record) + b'\n')
+        os.replace(tmp_path, filepath)
         
         print(f"💾 Unified report saved to: {filepath}")
         return filepath
+    
+    def _iter_findings(self):
+        """Stream every finding of the loaded scans as a report record"""
+        if self.semgrep_file:
+            for finding in iter_json_items(self.semgrep_file, 'results.item'):
+                yield {'scanner': 'Semgrep', 'finding': finding}
+        
+        if self.trivy_file:
+            for result in iter_json_items(self.trivy_file, 'Results.item'):
+                for vuln in result.get('Vulnerabilities') or ():
+                    yield {'scanner': 'Trivy', 'target': result.get('Target'), 'finding': vuln}
+        
+        if self.trufflehog_file:
+            for secret in iter_json_items(self.trufflehog_file, 'item'):
+                yield {'scanner': 'TruffleHog', 'finding': secret}
 
 
 # Test it
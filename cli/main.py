@@ -6,11 +6,13 @@ Complete Day 3 Version with All 3 Scanners + Aggregator
 
 import sys
 import os
+import io
 import argparse
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
-
-# Add parent directory to path
-sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from functools import partial
 
 # Import our scanners
 from scanners.semgrep_scanner import SemgrepScanner
@@ -55,37 +57,54 @@ def print_info(message):
 def print_warning(message):
     print(f"{Colors.WARNING}⚠ {message}{Colors.ENDC}")
 
-def check_tools():
-    """Check if security tools are installed"""
+# Tools each --scanner choice actually needs
+SCANNER_TOOLS = {
+    'semgrep': ('semgrep',),
+    'trivy': ('trivy',),
+    'trufflehog': ('trufflehog',),
+    'all': ('semgrep', 'trivy', 'trufflehog')
+}
+
+# Reported by 'check' but not required - no scanner uses them
+OPTIONAL_TOOLS = ('grype',)
+
+_tool_paths = {}
+
+def find_tool(tool_name):
+    """Locate a tool on PATH (looked up once per process)"""
+    if tool_name not in _tool_paths:
+        _tool_paths[tool_name] = shutil.which(tool_name)
+    return _tool_paths[tool_name]
+
+def check_tools(tools=SCANNER_TOOLS['all'], optional=()):
+    """Check if security tools are installed (missing optional ones don't fail)"""
     print_info("Checking if security tools are installed...")
     
-    tools = {
-        'semgrep': 'semgrep --version',
-        'trivy': 'trivy --version',
-        'grype': 'grype version',
-        'trufflehog': 'trufflehog --help'
-    }
-    
     all_installed = True
     
-    for tool_name, command in tools.items():
-        try:
-            os.system(f"{command} > /dev/null 2>&1")
+    for tool_name in tools:
+        if find_tool(tool_name):
             print_success(f"{tool_name} is installed")
-        except:
+        else:
             print_error(f"{tool_name} is NOT installed")
             all_installed = False
     
+    for tool_name in optional:
+        if find_tool(tool_name):
+            print_success(f"{tool_name} is installed (optional)")
+        else:
+            print_warning(f"{tool_name} is NOT installed (optional)")
+    
     return all_installed
 
-def scan_with_semgrep(target_path, show_all=False):
-    """Run Semgrep scan on target"""
+def scan_with_semgrep(target_path, show_all=False, timeout=None):
+    """Run Semgrep scan on target (stopped after timeout seconds, if given)"""
     print("\n" + "="*80)
     print_info("Starting Semgrep SAST scan...")
     print("="*80 + "\n")
     
     scanner = SemgrepScanner(target_path)
-    results = scanner.run_scan()
+    results = scanner.run_scan(timeout=timeout)
     
     if results:
         max_findings = 100 if show_all else 20
@@ -107,14 +126,14 @@ def scan_with_semgrep(target_path, show_all=False):
         print_error("Semgrep scan failed!")
         return False
 
-def scan_with_trivy(target_path, show_all=False):
-    """Run Trivy scan on target"""
+def scan_with_trivy(target_path, show_all=False, timeout=None):
+    """Run Trivy scan on target (stopped after timeout seconds, if given)"""
     print("\n" + "="*80)
     print_info("Starting Trivy dependency scan...")
     print("="*80 + "\n")
     
     scanner = TrivyScanner(target_path)
-    results = scanner.run_scan()
+    results = scanner.run_scan(timeout=timeout)
     
     if results:
         max_findings = 100 if show_all else 20
@@ -164,6 +183,51 @@ def scan_with_trufflehog(target_path, show_all=False):
         print("\n")
         return True
 
+class ThreadOutput(io.TextIOBase):
+    """Stdout proxy that sends each worker thread's prints to its own buffer"""
+    
+    def __init__(self, stream):
+        self.stream = stream
+        self._local = threading.local()
+    
+    def capture(self, buffer):
+        """Route prints from the calling thread into buffer (None to stop)"""
+        self._local.buffer = buffer
+    
+    def write(self, text):
+        buffer = getattr(self._local, 'buffer', None)
+        return (buffer or self.stream).write(text)
+    
+    def flush(self):
+        self.stream.flush()
+
+def run_all_scans(target_path, show_all=False, timeout=None):
+    """Run all scanners concurrently, printing each scanner's output as it finishes"""
+    scans = (partial(scan_with_semgrep, timeout=timeout),
+             partial(scan_with_trivy, timeout=timeout),
+             scan_with_trufflehog)
+    output = ThreadOutput(sys.stdout)
+    
+    def run_captured(scan):
+        buffer = io.StringIO()
+        output.capture(buffer)
+        try:
+            scan(target_path, show_all=show_all)
+        finally:
+            output.capture(None)
+        return buffer.getvalue()
+    
+    sys.stdout = output
+    try:
+        with ThreadPoolExecutor(max_workers=len(scans)) as pool:
+            futures = [pool.submit(run_captured, scan) for scan in scans]
+            for future in as_completed(futures):
+                # Write each scanner's report in one piece so they don't interleave
+                output.stream.write(future.result())
+                output.stream.flush()
+    finally:
+        sys.stdout = output.stream
+
 def main():
     parser = argparse.ArgumentParser(
         description='SecureFlow - DevSecOps Security Scanner',
@@ -203,6 +267,13 @@ Examples:
         help='Show all findings (not just first 20)'
     )
     
+    parser.add_argument(
+        '--timeout',
+        type=int,
+        default=None,
+        help='Stop Semgrep/Trivy after this many seconds (default: no limit)'
+    )
+    
     args = parser.parse_args()
     
     print_banner()
@@ -211,7 +282,7 @@ Examples:
     print_info(f"Started at: {current_time}\n")
     
     if args.command == 'check':
-        if check_tools():
+        if check_tools(optional=OPTIONAL_TOOLS):
             print("\n")
             print_success("All tools ready!")
             print_info("SecureFlow v2.0 is ready to scan!")
@@ -222,7 +293,7 @@ Examples:
     
     elif args.command == 'scan':
         print_info("Verifying tools...\n")
-        if not check_tools():
+        if not check_tools(SCANNER_TOOLS[args.scanner]):
             print_error("\nTools missing. Run 'check' first.")
             sys.exit(1)
         
@@ -233,13 +304,13 @@ Examples:
         print_success("All tools ready!\n")
         
         # Run scan based on scanner choice
-        if args.scanner == 'semgrep' or args.scanner == 'all':
-            scan_with_semgrep(args.target, show_all=args.all)
-        
-        if args.scanner == 'trivy' or args.scanner == 'all':
-            scan_with_trivy(args.target, show_all=args.all)
-        
-        if args.scanner == 'trufflehog' or args.scanner == 'all':
+        if args.scanner == 'all':
+            run_all_scans(args.target, show_all=args.all, timeout=args.timeout)
+        elif args.scanner == 'semgrep':
+            scan_with_semgrep(args.target, show_all=args.all, timeout=args.timeout)
+        elif args.scanner == 'trivy':
+            scan_with_trivy(args.target, show_all=args.all, timeout=args.timeout)
+        elif args.scanner == 'trufflehog':
             scan_with_trufflehog(args.target, show_all=args.all)
         
         # Generate unified report for 'all' scanner mode
@@ -274,5 +345,3 @@ if __name__ == "__main__":
         import traceback
         traceback.print_exc()
         sys.exit(1)
-EOF
-
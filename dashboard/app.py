@@ -1,140 +1,253 @@
 #!/usr/bin/env python3
-from flask import Flask, render_template, jsonify, request
-import json, os, subprocess, threading, re
+from flask import Flask, render_template, jsonify, request, make_response
+import os, sys, signal, subprocess, threading, re, atexit
 from pathlib import Path
 from datetime import datetime
+from functools import lru_cache
+
+from aggregator.result_aggregator import iter_json_items, load_json, loads_json
 
 app = Flask(__name__)
 SCAN_DIR = Path(__file__).parent.parent / 'data' / 'scans'
 PROJECT_ROOT = Path(__file__).parent.parent
 
 scan_status = {'running': False, 'progress': '', 'last_scan': None}
+scan_lock = threading.Lock()  # guards the check-and-set of scan_status['running']
+scan_process = None  # Popen handle of the running scan, for cancel_scan()
+
+ANSI_ESCAPE = re.compile(r'\x1b\[[0-9;]*m')
 
 def clean_ansi(text):
     """Remove ANSI color codes from text"""
-    return re.sub(r'\x1b\[[0-9;]*m', '', str(text))
+    text = text if isinstance(text, str) else str(text)
+    if '\x1b' not in text:
+        return text
+    return ANSI_ESCAPE.sub('', text)
+
+# pattern -> (scan dir mtime, newest matching file)
+_latest_scan_cache = {}
+
+def latest_scan(pattern):
+    """Newest scan file matching pattern (names are timestamped), or None"""
+    try:
+        dir_mtime = SCAN_DIR.stat().st_mtime_ns
+    except FileNotFoundError:
+        return None
+    cached = _latest_scan_cache.get(pattern)
+    if cached and cached[0] == dir_mtime:
+        return cached[1]
+    latest = max(SCAN_DIR.glob(pattern), default=None)
+    _latest_scan_cache[pattern] = (dir_mtime, latest)
+    return latest
 
 def get_latest_unified_report():
     try:
-        reports = sorted(SCAN_DIR.glob('unified_report_*.json'), reverse=True)
-        if reports:
-            with open(reports[0]) as f:
-                return json.load(f)
+        # .jsonl reports, or .json ones written by older versions (not
+        # '*.json*', which would also match a report's .tmp while it's written)
+        report = max(filter(None, (latest_scan('unified_report_*.jsonl'),
+                                   latest_scan('unified_report_*.json'))), default=None)
+        if report:
+            return load_unified_report(report, report.stat().st_mtime_ns)
     except Exception as e:
         print(f"Error: {e}")
     return None
 
 def get_semgrep_findings():
     try:
-        files = sorted(SCAN_DIR.glob('semgrep_scan_*.json'), reverse=True)
-        if not files:
+        latest = latest_scan('semgrep_scan_*.json')
+        if not latest:
             return []
-        with open(files[0]) as f:
-            data = json.load(f)
-        findings = []
-        for r in data.get('results', []):
-            findings.append({
-                'rule_id': r.get('check_id', 'Unknown'),
-                'file': r.get('path', 'Unknown'),
-                'line': r.get('start', {}).get('line', 0),
-                'message': r.get('extra', {}).get('message', 'No message'),
-                'severity': r.get('extra', {}).get('severity', 'WARNING'),
-                'category': r.get('extra', {}).get('metadata', {}).get('category', 'security'),
-                'cwe': r.get('extra', {}).get('metadata', {}).get('cwe', []),
-                'owasp': r.get('extra', {}).get('metadata', {}).get('owasp', []),
-            })
-        return findings
+        return load_semgrep_findings(latest, latest.stat().st_mtime_ns)
     except Exception as e:
         print(f"Semgrep error: {e}")
         return []
 
 def get_trivy_findings():
     try:
-        files = sorted(SCAN_DIR.glob('trivy_scan_*.json'), reverse=True)
-        if not files:
+        latest = latest_scan('trivy_scan_*.json')
+        if not latest:
             return []
-        with open(files[0]) as f:
-            data = json.load(f)
-        findings = []
-        for result in data.get('Results', []):
-            for v in result.get('Vulnerabilities', []):
-                findings.append({
-                    'cve_id': v.get('VulnerabilityID', 'N/A'),
-                    'package': v.get('PkgName', 'Unknown'),
-                    'installed_version': v.get('InstalledVersion', 'N/A'),
-                    'fixed_version': v.get('FixedVersion', 'N/A'),
-                    'severity': v.get('Severity', 'UNKNOWN'),
-                    'title': v.get('Title', 'No title'),
-                    'description': v.get('Description', '')[:200],
-                    'url': v.get('PrimaryURL', ''),
-                })
-        return findings
+        return load_trivy_findings(latest, latest.stat().st_mtime_ns)
     except Exception as e:
         print(f"Trivy error: {e}")
         return []
 
 def get_trufflehog_findings():
     try:
-        files = sorted(SCAN_DIR.glob('trufflehog_scan_*.json'), reverse=True)
-        if not files:
+        latest = latest_scan('trufflehog_scan_*.json')
+        if not latest:
             return []
-        with open(files[0]) as f:
-            data = json.load(f)
-        findings = []
-        if isinstance(data, list):
-            for item in data:
-                # Clean ANSI codes from keys and values
-                clean = {}
-                for k, v in item.items():
-                    clean_key = clean_ansi(k)
-                    clean_val = clean_ansi(v) if isinstance(v, str) else v
-                    clean[clean_key] = clean_val
-                findings.append({
-                    'reason': clean.get('Reason', 'Unknown'),
-                    'filepath': clean.get('Filepath', 'Unknown'),
-                    'date': clean.get('Date', 'Unknown'),
-                    'branch': clean.get('Branch', 'Unknown'),
-                    'commit': clean.get('Commit', 'Unknown'),
-                })
-        return findings
+        return load_trufflehog_findings(latest, latest.stat().st_mtime_ns)
     except Exception as e:
         print(f"TruffleHog error: {e}")
         return []
 
+# The loaders below are cached per (file, mtime_ns), so page reloads
+# between scans don't re-parse anything
+
+@lru_cache(maxsize=8)
+def load_unified_report(path, mtime_ns):
+    if path.suffix != '.jsonl':
+        return load_json(path)
+    # The summary is the first line - the findings after it aren't needed
+    with open(path, 'rb') as f:
+        return loads_json(f.readline())
+
+@lru_cache(maxsize=8)
+def load_semgrep_findings(path, mtime_ns):
+    findings = []
+    for r in iter_json_items(path, 'results.item'):
+        extra = r.get('extra') or {}
+        metadata = extra.get('metadata') or {}
+        start = r.get('start') or {}
+        findings.append({
+            'rule_id': r.get('check_id', 'Unknown'),
+            'file': r.get('path', 'Unknown'),
+            'line': start.get('line', 0),
+            'message': extra.get('message', 'No message'),
+            'severity': extra.get('severity', 'WARNING'),
+            'category': metadata.get('category', 'security'),
+            'cwe': metadata.get('cwe', ()),
+            'owasp': metadata.get('owasp', ()),
+        })
+    return findings
+
+@lru_cache(maxsize=8)
+def load_trivy_findings(path, mtime_ns):
+    findings = []
+    for v in iter_json_items(path, 'Results.item.Vulnerabilities.item'):
+        findings.append({
+            'cve_id': v.get('VulnerabilityID', 'N/A'),
+            'package': v.get('PkgName', 'Unknown'),
+            'installed_version': v.get('InstalledVersion', 'N/A'),
+            'fixed_version': v.get('FixedVersion', 'N/A'),
+            'severity': v.get('Severity', 'UNKNOWN'),
+            'title': v.get('Title', 'No title'),
+            'description': v.get('Description', '')[:200],
+            'url': v.get('PrimaryURL', ''),
+        })
+    return findings
+
+@lru_cache(maxsize=8)
+def load_trufflehog_findings(path, mtime_ns):
+    with open(path, 'rb') as f:
+        raw = f.read()
+    data = loads_json(raw)
+    if not isinstance(data, list):
+        return []
+    # Clean ANSI codes from keys and values - only output captured from a
+    # colour terminal has any, so check the raw bytes once first (JSON
+    # stores ESC as \u001b)
+    if b'\\u001b' in raw or b'\\u001B' in raw:
+        data = [{clean_ansi(k): clean_ansi(v) if isinstance(v, str) else v
+                 for k, v in item.items()} for item in data]
+    return [{
+        'reason': item.get('Reason', 'Unknown'),
+        'filepath': item.get('Filepath', 'Unknown'),
+        'date': item.get('Date', 'Unknown'),
+        'branch': item.get('Branch', 'Unknown'),
+        'commit': item.get('Commit', 'Unknown'),
+    } for item in data]
+
+def clear_scan_caches():
+    """Drop cached scan data (called when a new scan finishes)"""
+    for loader in (load_unified_report, load_semgrep_findings,
+                   load_trivy_findings, load_trufflehog_findings):
+        loader.cache_clear()
+
 def run_scan_background(target_path, scanners):
-    global scan_status
-    scan_status['running'] = True
-    scan_status['progress'] = f'Scanning {target_path}...'
+    """Run the CLI scan in a subprocess (caller has set scan_status['running'])"""
+    global scan_process
     try:
-        cmd = ['python3', str(PROJECT_ROOT / 'cli' / 'main.py'), 'scan', '-t', str(target_path), '-s', scanners]
+        # -u so the CLI's output reaches us line by line instead of at exit.
+        # Own session so cancel_scan() also stops the scanner tools it starts
+        cmd = [sys.executable, '-u', '-m', 'cli.main', 'scan', '-t', str(target_path), '-s', scanners]
         print(f"Running: {' '.join(cmd)}")
-        subprocess.run(cmd, capture_output=True, text=True, cwd=str(PROJECT_ROOT))
-        scan_status['progress'] = 'Scan complete!'
-        scan_status['last_scan'] = datetime.now().isoformat()
+        proc = scan_process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                               cwd=str(PROJECT_ROOT), start_new_session=True)
+        # Surface the latest output line as progress without keeping the output.
+        # Read as bytes: blank lines are skipped undecoded, and stray non-UTF-8
+        # output from a scanner can't abort the loop
+        last_line = ''
+        for raw_line in proc.stdout:
+            raw_line = raw_line.strip()
+            if raw_line:
+                last_line = scan_status['progress'] = clean_ansi(raw_line.decode('utf-8', 'replace'))[:120]
+        returncode = proc.wait()
+        if returncode < 0:
+            scan_status['progress'] = 'Scan cancelled'
+        elif returncode > 0:
+            # e.g. a missing tool or target - keep the CLI's last word on why
+            scan_status['progress'] = f'Scan failed (exit {returncode}): {last_line}'
+        else:
+            scan_status['progress'] = 'Scan complete!'
+            scan_status['last_scan'] = datetime.now().isoformat()
+        clear_scan_caches()
     except Exception as e:
         scan_status['progress'] = f'Error: {str(e)}'
     finally:
+        scan_process = None
         scan_status['running'] = False
 
+def cancel_scan():
+    """Terminate the running scan and its scanner processes; False if none"""
+    proc = scan_process
+    if proc is None or proc.poll() is not None:
+        return False
+    try:
+        os.killpg(proc.pid, signal.SIGTERM)
+    except ProcessLookupError:
+        return False
+    return True
+
+# Don't leave a scan running behind a stopped dashboard
+atexit.register(cancel_scan)
+
+def scan_files_etag():
+    """ETag for pages built from scan files: the scan directory's mtime"""
+    # Scan files are only ever written to a .tmp and renamed into place, or
+    # deleted, and each of those bumps the directory's mtime - one stat, no
+    # per-file races
+    try:
+        return hex(SCAN_DIR.stat().st_mtime_ns)
+    except FileNotFoundError:
+        return hex(0)
+
+def not_modified(etag):
+    """Empty 304 response carrying the ETag the full page would have"""
+    resp = make_response('', 304)
+    resp.set_etag(etag)
+    return resp
+
 @app.route('/')
 def index():
+    etag = scan_files_etag()
+    if etag in request.if_none_match:
+        return not_modified(etag)
     report = get_latest_unified_report()
-    return render_template('dashboard.html', report=report,
+    resp = make_response(render_template('dashboard.html', report=report,
                          scan_status=scan_status,
-                         scan_time=datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+                         scan_time=datetime.now().strftime('%Y-%m-%d %H:%M:%S')))
+    resp.set_etag(etag)
+    return resp
 
 @app.route('/results')
 def results():
+    etag = scan_files_etag()
+    if etag in request.if_none_match:
+        return not_modified(etag)
     report = get_latest_unified_report()
     semgrep = get_semgrep_findings()
     trivy = get_trivy_findings()
     trufflehog = get_trufflehog_findings()
-    return render_template('results.html',
+    resp = make_response(render_template('results.html',
                          report=report,
                          semgrep=semgrep,
                          trivy=trivy,
                          trufflehog=trufflehog,
-                         scan_time=datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+                         scan_time=datetime.now().strftime('%Y-%m-%d %H:%M:%S')))
+    resp.set_etag(etag)
+    return resp
 
 @app.route('/api/browse')
 def api_browse():
@@ -143,10 +256,12 @@ def api_browse():
         current_path = Path(current)
         if not current_path.exists():
             current_path = Path.home()
-        dirs = []
-        for item in sorted(current_path.iterdir()):
-            if item.is_dir() and not item.name.startswith('.'):
-                dirs.append({'name': item.name, 'path': str(item)})
+        # scandir answers is_dir() from the directory listing itself,
+        # instead of a stat() per child like Path.iterdir()
+        with os.scandir(current_path) as entries:
+            dirs = [{'name': entry.name, 'path': entry.path} for entry in entries
+                    if not entry.name.startswith('.') and entry.is_dir()]
+        dirs.sort(key=lambda d: d['name'])
         return jsonify({'current': str(current_path), 'parent': str(current_path.parent), 'dirs': dirs})
     except Exception as e:
         return jsonify({'error': str(e)}), 400
@@ -164,16 +279,27 @@ def api_scan():
         target_path = PROJECT_ROOT / target
     if not target_path.exists():
         return jsonify({'error': f'Path not found: {target_path}'}), 400
-    if scan_status['running']:
-        return jsonify({'error': 'Scan already running!'}), 400
+    with scan_lock:
+        if scan_status['running']:
+            return jsonify({'error': 'Scan already running!'}), 400
+        scan_status['running'] = True
+        scan_status['progress'] = f'Scanning {target_path}...'
     thread = threading.Thread(target=run_scan_background, args=(target_path, scanners))
     thread.daemon = True
     thread.start()
     return jsonify({'status': 'started', 'message': f'Scanning: {target_path}', 'target': str(target_path)})
 
+@app.route('/api/cancel', methods=['POST'])
+def api_cancel():
+    if not cancel_scan():
+        return jsonify({'error': 'No scan running'}), 400
+    return jsonify({'status': 'cancelling'})
+
 @app.route('/api/status')
 def api_status():
-    return jsonify(scan_status)
+    resp = jsonify(scan_status)
+    resp.add_etag()
+    return resp.make_conditional(request)
 
 if __name__ == '__main__':
     print("🚀 Starting SecureFlow Dashboard...")
@@ -17,7 +17,7 @@ NC='\033[0m'
 echo -e "${BLUE}Installing Python dependencies...${NC}"
 python3 -m venv venv 2>/dev/null || true
 source venv/bin/activate
-pip install flask cryptography python-dotenv 2>/dev/null
+pip install flask cryptography python-dotenv ijson orjson 2>/dev/null
 
 echo -e "${BLUE}Installing security tools...${NC}"
 pip install semgrep 2>/dev/null || pip install semgrep --break-system-packages
@@ -28,7 +28,7 @@ cat > secureflow << 'EOF'
 #!/bin/bash
 cd "$(dirname "$0")"
 source venv/bin/activate
-python3 cli/main.py "$@"
+python3 -m cli.main "$@"
 EOF
 chmod +x secureflow
 
@@ -40,7 +40,7 @@ echo "🚀 Starting SecureFlow Dashboard..."
 echo "📊 Open: http://localhost:5000"
 sleep 2
 xdg-open http://localhost:5000 2>/dev/null || open http://localhost:5000 2>/dev/null || true
-python3 dashboard/app.py
+python3 -m dashboard.app
 EOF
 chmod +x secureflow-dashboard
 
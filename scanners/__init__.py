@@ -0,0 +1,52 @@
+"""Helpers shared by the scanner modules"""
+
+import json
+import os
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def loads_json(data):
+    """Parse JSON text or bytes (with orjson when it is installed)"""
+    return orjson.loads(data) if orjson else json.loads(data)
+
+
+def load_json_file(filepath):
+    """Parse a JSON file written by a tool (None if it is missing or empty)"""
+    try:
+        with open(filepath, 'rb') as f:
+            data = f.read()
+    except FileNotFoundError:
+        return None
+    if not data:
+        return None
+    return loads_json(data)
+
+
+def write_json_atomic(filepath, obj, pretty=False):
+    """
+    Save obj as JSON at filepath
+    
+    Compact unless pretty - scan files are read by tools. Written beside
+    the target and renamed over it, so a reader never sees a half-written
+    file.
+    """
+    tmp_path = filepath + '.tmp'
+    if orjson:
+        with open(tmp_path, 'wb') as f:
+            f.write(orjson.dumps(obj, option=orjson.OPT_INDENT_2 if pretty else 0))
+    else:
+        with open(tmp_path, 'w') as f:
+            json.dump(obj, f, indent=2 if pretty else None)
+    os.replace(tmp_path, filepath)
+
+
+def remove_file(path):
+    """Delete path if it still exists"""
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
@@ -4,12 +4,65 @@ Semgrep Scanner Module
 This module runs Semgrep and parses its results
 """
 
+import io
 import subprocess
 import json
 import os
+import re
+import sys
+import weakref
+from collections import Counter
+from functools import lru_cache
 from datetime import datetime
 from pathlib import Path
 
+from scanners import load_json_file, remove_file, write_json_atomic
+
+
+# Shared stand-in for a missing nested object, so lookups on findings
+# don't allocate a fresh {} each time (never mutated)
+_EMPTY = {}
+
+# Color code by severity
+_SEVERITY_ICON = {
+    'ERROR': '🔴',
+    'WARNING': '🟡',
+    'INFO': '🔵'
+}
+
+# Rule-id keywords -> finding category. The alternatives are tried in order
+# at the start of the id, each looking ahead through the whole id, so the
+# first category whose keyword appears anywhere wins (only 'sql' ignores case)
+_CATEGORY_RE = re.compile(
+    r'(?:(?=.*?(?P<sql>(?i:sql)))'
+    r'|(?=.*?(?P<xss>xss|cross-site))'
+    r'|(?=.*?(?P<cmd>command-injection|system-call))'
+    r'|(?=.*?(?P<secret>secrets|api-key))'
+    r'|(?=.*?(?P<eval>eval))'
+    r'|(?=.*?(?P<path>path-traversal))'
+    r'|(?=.*?(?P<misc>debug|md5)))',
+    re.DOTALL
+)
+
+_GROUP_TO_CATEGORY = {
+    'sql': 'SQL Injection',
+    'xss': 'XSS',
+    'cmd': 'Command Injection',
+    'secret': 'Secrets',
+    'eval': 'Code Injection',
+    'path': 'Path Traversal',
+    'misc': 'Security Misconfiguration'
+}
+
+
+@lru_cache(maxsize=4096)
+def classify_rule(rule_id):
+    """Category of a Semgrep rule id, e.g. 'SQL Injection' ('Other' if unknown)"""
+    # Cached: a scan has far fewer distinct rules than findings, so most
+    # calls are a single dict lookup
+    match = _CATEGORY_RE.match(rule_id)
+    return _GROUP_TO_CATEGORY[match.lastgroup] if match else 'Other'
+
 
 class SemgrepScanner:
     """Class to handle Semgrep scanning operations"""
@@ -25,39 +78,60 @@ class SemgrepScanner:
         self.target_path = target_path
         self.output_dir = output_dir
         self.results = None
+        self._summary = None  # get_summary() cache, reset with results
+        self._output_file = None  # Unsaved output written by the tool itself
+        self._output_cleanup = None  # Deletes _output_file unless it's saved
         
         # Create output directory if it doesn't exist
         Path(output_dir).mkdir(parents=True, exist_ok=True)
     
-    def run_scan(self):
+    def run_scan(self, timeout=None):
         """
         Run Semgrep scan on target path
         
+        Args:
+            timeout: Seconds to wait for Semgrep before killing it (optional)
+        
         Returns:
             dict: Parsed scan results
         """
         print(f"🔍 Running Semgrep scan on: {self.target_path}")
         
+        # Semgrep writes its JSON straight to disk, so the results never go
+        # through a pipe and save_results() only has to rename the file
+        self._discard_output()
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        output_file = os.path.join(self.output_dir, f"semgrep_scan_{timestamp}.json.tmp")
+        
         try:
             # Build the command
             command = [
                 'semgrep',
                 '--config=auto',  # Use automatic rules
                 '--json',         # Output as JSON
+                '--output', output_file,
                 self.target_path
             ]
             
             # Run the command
-            result = subprocess.run(
-                command,
-                capture_output=True,  # Capture stdout and stderr
-                text=True,            # Return string, not bytes
-                check=False           # Don't raise exception on non-zero exit
-            )
+            try:
+                subprocess.run(
+                    command,
+                    stdout=subprocess.DEVNULL,
+                    stderr=subprocess.DEVNULL,
+                    timeout=timeout
+                )
+            except subprocess.TimeoutExpired:
+                print(f"⚠ Semgrep scan timed out after {timeout}s")
+                return None
             
-            # Parse JSON output
-            if result.stdout:
-                self.results = json.loads(result.stdout)
+            results = load_json_file(output_file)
+            if results is not None:
+                self.results = results
+                self._summary = None
+                self._output_file = output_file
+                # Deleted with the scanner (or at exit) if nothing saves it
+                self._output_cleanup = weakref.finalize(self, remove_file, output_file)
                 findings_count = len(self.results.get('results', []))
                 print(f"✓ Scan completed! Found {findings_count} findings")
                 return self.results
@@ -68,13 +142,24 @@ class SemgrepScanner:
         except Exception as e:
             print(f"✗ Error running Semgrep: {e}")
             return None
+        finally:
+            # Drop partial or unparseable output
+            if self._output_file is None:
+                remove_file(output_file)
+    
+    def _discard_output(self):
+        """Delete the tool's unsaved output file, if there is one"""
+        if self._output_cleanup:
+            self._output_cleanup()  # a finalizer only ever runs once
+        self._output_file = self._output_cleanup = None
     
-    def save_results(self, filename=None):
+    def save_results(self, filename=None, pretty=False):
         """
         Save scan results to JSON file
         
         Args:
             filename: Custom filename (optional)
+            pretty: Indent the JSON for reading by humans
         """
         if not self.results:
             print("⚠ No results to save")
@@ -87,9 +172,16 @@ class SemgrepScanner:
         
         filepath = os.path.join(self.output_dir, filename)
         
-        # Write to file
-        with open(filepath, 'w') as f:
-            json.dump(self.results, f, indent=2)
+        # The file Semgrep wrote holds exactly these results - move it into place
+        if self._output_file and not pretty:
+            os.replace(self._output_file, filepath)
+            self._output_cleanup.detach()
+            self._output_file = self._output_cleanup = None
+            print(f"💾 Results saved to: {filepath}")
+            return filepath
+        
+        write_json_atomic(filepath, self.results, pretty)
+        self._discard_output()
         
         print(f"💾 Results saved to: {filepath}")
         return filepath
@@ -103,44 +195,21 @@ class SemgrepScanner:
         """
         if not self.results:
             return None
+        if self._summary is not None:
+            return self._summary
         
         findings = self.results.get('results', [])
         
-        # Count by severity
-        severity_count = {
-            'ERROR': 0,
-            'WARNING': 0,
-            'INFO': 0
-        }
-        
-        # Count by category
-        category_count = {}
+        # Count by severity, keeping the three standard levels even at zero
+        severity_count = dict.fromkeys(('ERROR', 'WARNING', 'INFO'), 0)
+        severity_count.update(Counter(
+            (f.get('extra') or _EMPTY).get('severity', 'INFO') for f in findings
+        ))
         
-        for finding in findings:
-            # Get severity
-            severity = finding.get('extra', {}).get('severity', 'INFO')
-            severity_count[severity] = severity_count.get(severity, 0) + 1
-            
-            # Get category from rule ID
-            rule_id = finding.get('check_id', '')
-            if 'sql-injection' in rule_id or 'sql' in rule_id.lower():
-                category = 'SQL Injection'
-            elif 'xss' in rule_id or 'cross-site' in rule_id:
-                category = 'XSS'
-            elif 'command-injection' in rule_id or 'system-call' in rule_id:
-                category = 'Command Injection'
-            elif 'secrets' in rule_id or 'api-key' in rule_id:
-                category = 'Secrets'
-            elif 'eval' in rule_id:
-                category = 'Code Injection'
-            elif 'path-traversal' in rule_id:
-                category = 'Path Traversal'
-            elif 'debug' in rule_id or 'md5' in rule_id:
-                category = 'Security Misconfiguration'
-            else:
-                category = 'Other'
-            
-            category_count[category] = category_count.get(category, 0) + 1
+        # Count by category from rule ID
+        category_count = dict(Counter(
+            classify_rule(f.get('check_id', '')) for f in findings
+        ))
         
         summary = {
             'total_findings': len(findings),
@@ -150,6 +219,7 @@ class SemgrepScanner:
             'scan_time': datetime.now().isoformat()
         }
         
+        self._summary = summary
         return summary
     
     def print_findings(self, max_findings=10):
@@ -169,48 +239,50 @@ class SemgrepScanner:
             print("✓ No vulnerabilities found!")
             return
         
-        print("\n" + "="*80)
-        print(f"📊 SEMGREP SCAN RESULTS")
-        print("="*80)
+        # Built up in memory and written once
+        buf = io.StringIO()
+        w = buf.write
+        
+        w("\n" + "="*80 + "\n")
+        w(f"📊 SEMGREP SCAN RESULTS\n")
+        w("="*80 + "\n")
         
         # Print summary
         summary = self.get_summary()
-        print(f"\n📈 Summary:")
-        print(f"   Total Findings: {summary['total_findings']}")
-        print(f"   🔴 ERROR:   {summary['by_severity'].get('ERROR', 0)}")
-        print(f"   🟡 WARNING: {summary['by_severity'].get('WARNING', 0)}")
-        print(f"   🔵 INFO:    {summary['by_severity'].get('INFO', 0)}")
+        w(f"\n📈 Summary:\n")
+        w(f"   Total Findings: {summary['total_findings']}\n")
+        w(f"   🔴 ERROR:   {summary['by_severity'].get('ERROR', 0)}\n")
+        w(f"   🟡 WARNING: {summary['by_severity'].get('WARNING', 0)}\n")
+        w(f"   🔵 INFO:    {summary['by_severity'].get('INFO', 0)}\n")
         
-        print(f"\n📂 By Category:")
+        w(f"\n📂 By Category:\n")
         for category, count in sorted(summary['by_category'].items(), key=lambda x: x[1], reverse=True):
-            print(f"   {category}: {count}")
+            w(f"   {category}: {count}\n")
         
-        print(f"\n🔍 Detailed Findings (showing {min(max_findings, len(findings))} of {len(findings)}):\n")
+        w(f"\n🔍 Detailed Findings (showing {min(max_findings, len(findings))} of {len(findings)}):\n\n")
         
         # Print individual findings
         for idx, finding in enumerate(findings[:max_findings], 1):
-            severity = finding.get('extra', {}).get('severity', 'INFO')
-            message = finding.get('extra', {}).get('message', 'No message')
+            extra = finding.get('extra') or _EMPTY
+            severity = extra.get('severity', 'INFO')
+            message = extra.get('message', 'No message')
             path = finding.get('path', 'Unknown file')
-            line = finding.get('start', {}).get('line', '?')
+            line = (finding.get('start') or _EMPTY).get('line', '?')
             rule_id = finding.get('check_id', 'Unknown rule')
             
-            # Color code by severity
-            severity_icon = {
-                'ERROR': '🔴',
-                'WARNING': '🟡',
-                'INFO': '🔵'
-            }.get(severity, '⚪')
-            
-            print(f"{severity_icon} [{severity}] Finding #{idx}")
-            print(f"   Rule: {rule_id}")
-            print(f"   File: {path}:{line}")
-            print(f"   Issue: {message[:120]}...")
-            print()
+            w(
+                f"{_SEVERITY_ICON.get(severity, '⚪')} [{severity}] Finding #{idx}\n"
+                f"   Rule: {rule_id}\n"
+                f"   File: {path}:{line}\n"
+                f"   Issue: {message[:120]}...\n"
+                "\n"
+            )
         
         if len(findings) > max_findings:
-            print(f"   ... and {len(findings) - max_findings} more findings")
-            print(f"   💡 Tip: Use --all flag to see all findings\n")
+            w(f"   ... and {len(findings) - max_findings} more findings\n")
+            w(f"   💡 Tip: Use --all flag to see all findings\n\n")
+        
+        sys.stdout.write(buf.getvalue())
     
     def get_critical_findings(self):
         """Get only ERROR severity findings"""
@@ -220,7 +292,7 @@ class SemgrepScanner:
         findings = self.results.get('results', [])
         critical = [
             f for f in findings 
-            if f.get('extra', {}).get('severity') == 'ERROR'
+            if (f.get('extra') or _EMPTY).get('severity') == 'ERROR'
         ]
         
         return critical
@@ -232,7 +304,7 @@ if __name__ == "__main__":
     scanner = SemgrepScanner("test-apps/vulnerable-app")
     scanner.run_scan()
     scanner.print_findings(max_findings=30)  # Show all findings
-    scanner.save_results()
+    scanner.save_results(pretty=True)
     
     # Print summary
     summary = scanner.get_summary()
@@ -4,12 +4,28 @@ Trivy Scanner Module
 Scans for vulnerabilities in dependencies and containers
 """
 
+import io
 import subprocess
 import json
 import os
+import sys
+import weakref
+from collections import Counter
 from datetime import datetime
 from pathlib import Path
 
+from scanners import load_json_file, remove_file, write_json_atomic
+
+
+# Color code by severity
+_SEVERITY_ICON = {
+    'CRITICAL': '🔴',
+    'HIGH': '🟠',
+    'MEDIUM': '🟡',
+    'LOW': '🟢',
+    'UNKNOWN': '⚪'
+}
+
 
 class TrivyScanner:
     """Class to handle Trivy scanning operations"""
@@ -25,22 +41,32 @@ class TrivyScanner:
         self.target_path = target_path
         self.output_dir = output_dir
         self.results = None
+        self._summary = None  # get_summary() cache, reset with results
+        self._output_file = None  # Unsaved output written by the tool itself
+        self._output_cleanup = None  # Deletes _output_file unless it's saved
         
         # Create output directory if it doesn't exist
         Path(output_dir).mkdir(parents=True, exist_ok=True)
     
-    def run_scan(self, scan_type="fs"):
+    def run_scan(self, scan_type="fs", timeout=None):
         """
         Run Trivy scan
         
         Args:
             scan_type: Type of scan (fs=filesystem, image=container)
+            timeout: Seconds to wait for Trivy before killing it (optional)
         
         Returns:
             dict: Parsed scan results
         """
         print(f"🔍 Running Trivy scan on: {self.target_path}")
         
+        # Trivy writes its JSON straight to disk, so the results never go
+        # through a pipe and save_results() only has to rename the file
+        self._discard_output()
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        output_file = os.path.join(self.output_dir, f"trivy_scan_{timestamp}.json.tmp")
+        
         try:
             # Build the command
             command = [
@@ -48,27 +74,33 @@ class TrivyScanner:
                 scan_type,
                 '--format', 'json',
                 '--scanners', 'vuln',
+                '--output', output_file,
                 self.target_path
             ]
             
             # Run the command
-            result = subprocess.run(
-                command,
-                capture_output=True,
-                text=True,
-                check=False
-            )
+            try:
+                subprocess.run(
+                    command,
+                    stdout=subprocess.DEVNULL,
+                    stderr=subprocess.DEVNULL,
+                    timeout=timeout
+                )
+            except subprocess.TimeoutExpired:
+                print(f"⚠ Trivy scan timed out after {timeout}s")
+                return None
             
-            # Parse JSON output
-            if result.stdout:
-                self.results = json.loads(result.stdout)
+            results = load_json_file(output_file)
+            if results is not None:
+                self.results = results
+                self._summary = None
+                self._output_file = output_file
+                # Deleted with the scanner (or at exit) if nothing saves it
+                self._output_cleanup = weakref.finalize(self, remove_file, output_file)
                 
-                # Count total vulnerabilities
-                total_vulns = 0
-                if 'Results' in self.results:
-                    for res in self.results['Results']:
-                        if 'Vulnerabilities' in res and res['Vulnerabilities']:
-                            total_vulns += len(res['Vulnerabilities'])
+                # Counted once here; get_summary() keeps it for later calls
+                summary = self.get_summary()
+                total_vulns = summary['total_vulnerabilities'] if summary else 0
                 
                 print(f"✓ Scan completed! Found {total_vulns} vulnerabilities")
                 return self.results
@@ -79,8 +111,18 @@ class TrivyScanner:
         except Exception as e:
             print(f"✗ Error running Trivy: {e}")
             return None
+        finally:
+            # Drop partial or unparseable output
+            if self._output_file is None:
+                remove_file(output_file)
+    
+    def _discard_output(self):
+        """Delete the tool's unsaved output file, if there is one"""
+        if self._output_cleanup:
+            self._output_cleanup()  # a finalizer only ever runs once
+        self._output_file = self._output_cleanup = None
     
-    def save_results(self, filename=None):
+    def save_results(self, filename=None, pretty=False):
         """Save scan results to JSON file"""
         if not self.results:
             print("⚠ No results to save")
@@ -92,8 +134,16 @@ class TrivyScanner:
         
         filepath = os.path.join(self.output_dir, filename)
         
-        with open(filepath, 'w') as f:
-            json.dump(self.results, f, indent=2)
+        # The file Trivy wrote holds exactly these results - move it into place
+        if self._output_file and not pretty:
+            os.replace(self._output_file, filepath)
+            self._output_cleanup.detach()
+            self._output_file = self._output_cleanup = None
+            print(f"💾 Results saved to: {filepath}")
+            return filepath
+        
+        write_json_atomic(filepath, self.results, pretty)
+        self._discard_output()
         
         print(f"💾 Results saved to: {filepath}")
         return filepath
@@ -102,32 +152,24 @@ class TrivyScanner:
         """Get summary of findings"""
         if not self.results:
             return None
+        if self._summary is not None:
+            return self._summary
         
-        severity_count = {
-            'CRITICAL': 0,
-            'HIGH': 0,
-            'MEDIUM': 0,
-            'LOW': 0,
-            'UNKNOWN': 0
-        }
-        
-        vulnerabilities = []
-        
-        if 'Results' in self.results:
-            for result in self.results['Results']:
-                if 'Vulnerabilities' in result and result['Vulnerabilities']:
-                    for vuln in result['Vulnerabilities']:
-                        severity = vuln.get('Severity', 'UNKNOWN')
-                        severity_count[severity] = severity_count.get(severity, 0) + 1
-                        vulnerabilities.append(vuln)
+        severity_count = dict.fromkeys(('CRITICAL', 'HIGH', 'MEDIUM', 'LOW', 'UNKNOWN'), 0)
+        severity_count.update(Counter(
+            vuln.get('Severity', 'UNKNOWN')
+            for result in self.results.get('Results') or ()
+            for vuln in result.get('Vulnerabilities') or ()
+        ))
         
         summary = {
-            'total_vulnerabilities': len(vulnerabilities),
+            'total_vulnerabilities': sum(severity_count.values()),
             'by_severity': severity_count,
             'scanned_path': self.target_path,
             'scan_time': datetime.now().isoformat()
         }
         
+        self._summary = summary
         return summary
     
     def print_findings(self, max_findings=10):
@@ -136,31 +178,37 @@ class TrivyScanner:
             print("⚠ No results to display")
             return
         
-        print("\n" + "="*80)
-        print(f"📊 TRIVY SCAN RESULTS")
-        print("="*80)
+        # Built up in memory and written once
+        buf = io.StringIO()
+        w = buf.write
+        
+        w("\n" + "="*80 + "\n")
+        w(f"📊 TRIVY SCAN RESULTS\n")
+        w("="*80 + "\n")
         
         summary = self.get_summary()
-        print(f"\n📈 Summary:")
-        print(f"   Total Vulnerabilities: {summary['total_vulnerabilities']}")
-        print(f"   🔴 CRITICAL: {summary['by_severity'].get('CRITICAL', 0)}")
-        print(f"   🟠 HIGH:     {summary['by_severity'].get('HIGH', 0)}")
-        print(f"   🟡 MEDIUM:   {summary['by_severity'].get('MEDIUM', 0)}")
-        print(f"   🟢 LOW:      {summary['by_severity'].get('LOW', 0)}")
+        w(f"\n📈 Summary:\n")
+        w(f"   Total Vulnerabilities: {summary['total_vulnerabilities']}\n")
+        w(f"   🔴 CRITICAL: {summary['by_severity'].get('CRITICAL', 0)}\n")
+        w(f"   🟠 HIGH:     {summary['by_severity'].get('HIGH', 0)}\n")
+        w(f"   🟡 MEDIUM:   {summary['by_severity'].get('MEDIUM', 0)}\n")
+        w(f"   🟢 LOW:      {summary['by_severity'].get('LOW', 0)}\n")
         
         if summary['total_vulnerabilities'] == 0:
-            print("\n✓ No vulnerabilities found!")
+            w("\n✓ No vulnerabilities found!\n")
+            sys.stdout.write(buf.getvalue())
             return
         
-        print(f"\n🔍 Detailed Findings (showing {min(max_findings, summary['total_vulnerabilities'])} of {summary['total_vulnerabilities']}):\n")
+        w(f"\n🔍 Detailed Findings (showing {min(max_findings, summary['total_vulnerabilities'])} of {summary['total_vulnerabilities']}):\n\n")
         
         count = 0
         if 'Results' in self.results:
             for result in self.results['Results']:
-                if 'Vulnerabilities' in result and result['Vulnerabilities']:
+                vulns = result.get('Vulnerabilities')
+                if vulns:
                     target = result.get('Target', 'Unknown')
                     
-                    for vuln in result['Vulnerabilities'][:max_findings - count]:
+                    for vuln in vulns[:max_findings - count]:
                         count += 1
                         severity = vuln.get('Severity', 'UNKNOWN')
                         vuln_id = vuln.get('VulnerabilityID', 'Unknown')
@@ -169,20 +217,14 @@ class TrivyScanner:
                         fixed = vuln.get('FixedVersion', 'Not available')
                         title = vuln.get('Title', 'No description')
                         
-                        severity_icon = {
-                            'CRITICAL': '🔴',
-                            'HIGH': '🟠',
-                            'MEDIUM': '🟡',
-                            'LOW': '🟢',
-                            'UNKNOWN': '⚪'
-                        }.get(severity, '⚪')
-                        
-                        print(f"{severity_icon} [{severity}] Finding #{count}")
-                        print(f"   CVE: {vuln_id}")
-                        print(f"   Package: {pkg_name} ({installed})")
-                        print(f"   Fixed in: {fixed}")
-                        print(f"   Issue: {title[:100]}...")
-                        print()
+                        w(
+                            f"{_SEVERITY_ICON.get(severity, '⚪')} [{severity}] Finding #{count}\n"
+                            f"   CVE: {vuln_id}\n"
+                            f"   Package: {pkg_name} ({installed})\n"
+                            f"   Fixed in: {fixed}\n"
+                            f"   Issue: {title[:100]}...\n"
+                            "\n"
+                        )
                         
                         if count >= max_findings:
                             break
@@ -191,8 +233,10 @@ class TrivyScanner:
                     break
         
         if summary['total_vulnerabilities'] > max_findings:
-            print(f"   ... and {summary['total_vulnerabilities'] - max_findings} more vulnerabilities")
-            print(f"   💡 Tip: Use --all flag to see all findings\n")
+            w(f"   ... and {summary['total_vulnerabilities'] - max_findings} more vulnerabilities\n")
+            w(f"   💡 Tip: Use --all flag to see all findings\n\n")
+        
+        sys.stdout.write(buf.getvalue())
 
 
 # Example usage
@@ -200,7 +244,7 @@ if __name__ == "__main__":
     scanner = TrivyScanner("test-apps/vulnerable-app")
     scanner.run_scan()
     scanner.print_findings(max_findings=30)
-    scanner.save_results()
+    scanner.save_results(pretty=True)
     
     summary = scanner.get_summary()
     print(f"\n📊 Final Summary:")
@@ -4,12 +4,79 @@ TruffleHog Scanner Module
 Scans for secrets in files and git history
 """
 
+import io
 import subprocess
+import threading
 import json
 import os
+import re
+import shutil
+import sys
+import tempfile
 from datetime import datetime
+from functools import lru_cache
 from pathlib import Path
 
+from scanners import loads_json, write_json_atomic
+
+
+@lru_cache(maxsize=1)
+def trufflehog_version():
+    """Major version of the installed TruffleHog (2 if it can't be told)"""
+    try:
+        result = subprocess.run(['trufflehog', '--version'], capture_output=True, timeout=10)
+    except (OSError, subprocess.TimeoutExpired):
+        return 2
+    # v3 prints "trufflehog 3.x.y"; v2 has no --version at all
+    match = re.search(rb'trufflehog (\d+)\.', result.stdout + result.stderr)
+    return int(match.group(1)) if match else 2
+
+
+def parse_v2_output(stream):
+    """
+    Parse TruffleHog v2's text report from a binary stream
+    
+    "~~~~~" lines separate secrets, "Key: value" lines fill them in.
+    """
+    secrets_found = []
+    current_secret = {}
+    for raw_line in stream:
+        if raw_line.startswith(b'~~~~~'):
+            if current_secret:
+                secrets_found.append(current_secret)
+            current_secret = {}
+            continue
+        key, sep, value = raw_line.partition(b':')
+        if sep:
+            current_secret[key.decode('utf-8', 'replace').strip()] = \
+                value.decode('utf-8', 'replace').strip()
+    if current_secret:
+        secrets_found.append(current_secret)
+    return secrets_found
+
+
+def parse_v3_output(stream):
+    """
+    Parse TruffleHog v3's JSON-lines report from a binary stream
+    
+    Findings are flattened to the v2 keys the rest of SecureFlow reads.
+    """
+    secrets_found = []
+    for raw_line in stream:
+        if not raw_line.strip():
+            continue
+        finding = loads_json(raw_line)
+        source = (finding.get('SourceMetadata') or {}).get('Data') or {}
+        location = source.get('Filesystem') or source.get('Git') or {}
+        secrets_found.append({
+            'Reason': finding.get('DetectorName', 'Unknown'),
+            'Filepath': location.get('file', 'Unknown'),
+            'Line': location.get('line', '?'),
+            'Commit': location.get('commit', 'Unknown'),
+            'Verified': finding.get('Verified', False)
+        })
+    return secrets_found
+
 
 class TruffleHogScanner:
     """Class to handle TruffleHog scanning operations"""
@@ -25,6 +92,7 @@ class TruffleHogScanner:
         self.target_path = target_path
         self.output_dir = output_dir
         self.results = []
+        self._summary = None  # get_summary() cache, reset with results
         
         Path(output_dir).mkdir(parents=True, exist_ok=True)
     
@@ -32,102 +100,96 @@ class TruffleHogScanner:
         """Run TruffleHog scan"""
         print(f"🔍 Running TruffleHog scan on: {self.target_path}")
         
-        # Check if it's a git repo
-        is_git_repo = os.path.exists(os.path.join(self.target_path, '.git'))
-        
-        if not is_git_repo:
-            print("⚠ Not a git repository - initializing temporary git repo...")
-            try:
-                # Initialize git temporarily
-                subprocess.run(['git', 'init'], cwd=self.target_path, capture_output=True, check=True)
-                subprocess.run(['git', 'add', '.'], cwd=self.target_path, capture_output=True, check=True)
-                subprocess.run(['git', 'config', 'user.email', 'scan@secureflow.local'], cwd=self.target_path, capture_output=True)
-                subprocess.run(['git', 'config', 'user.name', 'SecureFlow Scanner'], cwd=self.target_path, capture_output=True)
-                subprocess.run(['git', 'commit', '-m', 'temp scan'], cwd=self.target_path, capture_output=True, check=True)
-                temp_git = True
-            except:
-                print("⚠ Could not initialize git - skipping TruffleHog scan")
-                return []
+        temp_git = None
+        if trufflehog_version() >= 3:
+            # v3 scans plain directories itself - no git repo needed
+            command = ['trufflehog', 'filesystem', '--json', '--no-update', self.target_path]
+            parse = parse_v3_output
         else:
-            temp_git = False
-        
-        try:
-            # Build the command
+            scan_path = self.target_path
+            if not os.path.exists(os.path.join(self.target_path, '.git')):
+                # v2 only scans git history: snapshot the directory into a
+                # throwaway git dir under /tmp, leaving the target untouched
+                print("⚠ Not a git repository - initializing temporary git repo...")
+                temp_git = scan_path = self._snapshot_to_git()
+                if not temp_git:
+                    print("⚠ Could not initialize git - skipping TruffleHog scan")
+                    return []
             command = [
                 'trufflehog',
                 '--regex',
                 '--entropy=True',
                 '--max_depth=50',
-                self.target_path
+                scan_path
             ]
-            
-            # Run the command
-            result = subprocess.run(
+            parse = parse_v2_output
+        
+        try:
+            # Run the command and parse its report as it streams out
+            proc = subprocess.Popen(
                 command,
-                capture_output=True,
-                text=True,
-                check=False,
-                timeout=30
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL
             )
+            timed_out = threading.Event()
             
-            # Parse output
-            if result.stdout and result.stdout.strip():
-                findings = result.stdout.strip().split('\n')
-                
-                secrets_found = []
-                current_secret = {}
-                
-                for line in findings:
-                    if line.startswith('~~~~~'):
-                        if current_secret:
-                            secrets_found.append(current_secret)
-                        current_secret = {}
-                    elif ':' in line and current_secret is not None:
-                        try:
-                            key, value = line.split(':', 1)
-                            current_secret[key.strip()] = value.strip()
-                        except:
-                            continue
-                
-                if current_secret:
-                    secrets_found.append(current_secret)
-                
-                self.results = secrets_found
-                
-                # Clean up temp git if we created it
-                if temp_git:
-                    try:
-                        import shutil
-                        git_dir = os.path.join(self.target_path, '.git')
-                        if os.path.exists(git_dir):
-                            shutil.rmtree(git_dir)
-                    except:
-                        pass
-                
-                print(f"✓ Scan completed! Found {len(self.results)} potential secrets")
-                return self.results
-            else:
-                # Clean up temp git
-                if temp_git:
-                    try:
-                        import shutil
-                        git_dir = os.path.join(self.target_path, '.git')
-                        if os.path.exists(git_dir):
-                            shutil.rmtree(git_dir)
-                    except:
-                        pass
-                
+            def kill():
+                timed_out.set()
+                proc.kill()
+            
+            timer = threading.Timer(30, kill)
+            timer.start()
+            try:
+                with proc.stdout:
+                    secrets_found = parse(proc.stdout)
+            finally:
+                timer.cancel()
+                proc.wait()
+            
+            if timed_out.is_set():
+                print("⚠ TruffleHog scan timed out")
+                return []
+            
+            if not secrets_found:
                 print("✓ No secrets found!")
                 return []
+            
+            self.results = secrets_found
+            self._summary = None
+            print(f"✓ Scan completed! Found {len(self.results)} potential secrets")
+            return self.results
                 
-        except subprocess.TimeoutExpired:
-            print("⚠ TruffleHog scan timed out")
-            return []
         except Exception as e:
             print(f"✗ Error running TruffleHog: {e}")
             return []
+        finally:
+            if temp_git:
+                shutil.rmtree(temp_git, ignore_errors=True)
     
-    def save_results(self, filename=None):
+    def _snapshot_to_git(self):
+        """
+        Commit the target directory into a temporary git dir
+        
+        Returns:
+            str: Path of the git dir (None if git failed)
+        """
+        git_dir = tempfile.mkdtemp(prefix='secureflow-git-')
+        git = [
+            'git', f'--git-dir={git_dir}', f'--work-tree={self.target_path}',
+            '-c', 'user.email=scan@secureflow.local',
+            '-c', 'user.name=SecureFlow Scanner',
+            '-c', 'commit.gpgsign=false'
+        ]
+        try:
+            subprocess.run(git + ['init', '-q'], capture_output=True, check=True)
+            subprocess.run(git + ['add', '-A'], capture_output=True, check=True)
+            subprocess.run(git + ['commit', '-q', '-m', 'temp scan'], capture_output=True, check=True)
+        except (OSError, subprocess.CalledProcessError):
+            shutil.rmtree(git_dir, ignore_errors=True)
+            return None
+        return git_dir
+    
+    def save_results(self, filename=None, pretty=False):
         """Save scan results"""
         if not self.results:
             return None
@@ -138,8 +200,7 @@ class TruffleHogScanner:
         
         filepath = os.path.join(self.output_dir, filename)
         
-        with open(filepath, 'w') as f:
-            json.dump(self.results, f, indent=2)
+        write_json_atomic(filepath, self.results, pretty)
         
         print(f"💾 Results saved to: {filepath}")
         return filepath
@@ -152,6 +213,8 @@ class TruffleHogScanner:
                 'by_type': {},
                 'high_entropy': 0
             }
+        if self._summary is not None:
+            return self._summary
         
         type_count = {}
         high_entropy = 0
@@ -160,23 +223,23 @@ class TruffleHogScanner:
             # Try to categorize by content
             finding_type = 'Unknown'
             
-            if any(k in str(finding).lower() for k in ['reason', 'Reason']):
-                reason = finding.get('Reason', finding.get('reason', ''))
-                if 'high entropy' in reason.lower():
-                    high_entropy += 1
-                    finding_type = 'High Entropy String'
-                elif 'regex' in reason.lower():
-                    finding_type = 'Pattern Match'
+            reason = (finding.get('Reason') or finding.get('reason') or '').lower()
+            if 'high entropy' in reason:
+                high_entropy += 1
+                finding_type = 'High Entropy String'
+            elif 'regex' in reason:
+                finding_type = 'Pattern Match'
             
             type_count[finding_type] = type_count.get(finding_type, 0) + 1
         
-        return {
+        self._summary = {
             'total_secrets': len(self.results),
             'by_type': type_count,
             'high_entropy': high_entropy,
             'scanned_path': self.target_path,
             'scan_time': datetime.now().isoformat()
         }
+        return self._summary
     
     def print_findings(self, max_findings=10):
         """Print findings"""
@@ -184,34 +247,40 @@ class TruffleHogScanner:
             print("\n✓ No secrets found!")
             return
         
-        print("\n" + "="*80)
-        print(f"📊 TRUFFLEHOG SCAN RESULTS")
-        print("="*80)
+        # Built up in memory and written once
+        buf = io.StringIO()
+        w = buf.write
+        
+        w("\n" + "="*80 + "\n")
+        w(f"📊 TRUFFLEHOG SCAN RESULTS\n")
+        w("="*80 + "\n")
         
         summary = self.get_summary()
-        print(f"\n📈 Summary:")
-        print(f"   Total Secrets Found: {summary['total_secrets']}")
-        print(f"   High Entropy Strings: {summary['high_entropy']}")
+        w(f"\n📈 Summary:\n")
+        w(f"   Total Secrets Found: {summary['total_secrets']}\n")
+        w(f"   High Entropy Strings: {summary['high_entropy']}\n")
         
         if summary['by_type']:
-            print(f"\n📂 By Type:")
+            w(f"\n📂 By Type:\n")
             for secret_type, count in sorted(summary['by_type'].items(), key=lambda x: x[1], reverse=True):
-                print(f"   {secret_type}: {count}")
+                w(f"   {secret_type}: {count}\n")
         
-        print(f"\n🔍 Detailed Findings (showing {min(max_findings, len(self.results))} of {len(self.results)}):\n")
+        w(f"\n🔍 Detailed Findings (showing {min(max_findings, len(self.results))} of {len(self.results)}):\n\n")
         
         for idx, finding in enumerate(self.results[:max_findings], 1):
             reason = finding.get('Reason', finding.get('reason', 'Unknown'))
             filepath = finding.get('path', finding.get('Path', 'Unknown'))
             
-            print(f"🔑 Secret #{idx}")
-            print(f"   Reason: {reason}")
-            print(f"   File: {filepath}")
-            print()
+            w(f"🔑 Secret #{idx}\n")
+            w(f"   Reason: {reason}\n")
+            w(f"   File: {filepath}\n")
+            w("\n")
         
         if len(self.results) > max_findings:
-            print(f"   ... and {len(self.results) - max_findings} more secrets")
-            print(f"   💡 Tip: Use --all flag to see all findings\n")
+            w(f"   ... and {len(self.results) - max_findings} more secrets\n")
+            w(f"   💡 Tip: Use --all flag to see all findings\n\n")
+        
+        sys.stdout.write(buf.getvalue())
 
 
 # Example usage
@@ -219,7 +288,7 @@ if __name__ == "__main__":
     scanner = TruffleHogScanner("test-apps/vulnerable-app")
     scanner.run_scan()
     scanner.print_findings()
-    scanner.save_results()
+    scanner.save_results(pretty=True)
     
     summary = scanner.get_summary()
     print(f"\n📊 Final Summary:")
@@ -6,10 +6,36 @@ Useful for storing secrets in configuration files or databases.
 """
 
 from cryptography.fernet import Fernet
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+import base64
 import os
 import json
+import threading
 from pathlib import Path
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+# Keys and their Fernet ciphers by resolved key file, so every vault in
+# the process reads a key file once while it is unchanged (entries carry
+# the file's mtime); plus the vaults handed out by shared()
+_KEY_CACHE = {}
+_SHARED_VAULTS = {}
+_CACHE_LOCK = threading.RLock()
+
+
+def _key_mtime(key_file: Path):
+    """Modification time of a key file (None if it doesn't exist)"""
+    try:
+        return key_file.stat().st_mtime_ns
+    except FileNotFoundError:
+        return None
+
 
 class SecretVault:
     """
@@ -22,16 +48,68 @@ class SecretVault:
     - Google Cloud Secret Manager
     """
     
-    def __init__(self, key_file: str = '.vault_key'):
+    # Prefix marking AES-GCM tokens from encrypt_bulk() (Fernet tokens are plain base64)
+    GCM_PREFIX = 'gcm:'
+    
+    def __init__(self, key_file: str = '.vault_key', fast: bool = False):
         """
         Initialize the vault
         
         Args:
             key_file: Path to encryption key file
+            fast: Also set up AES-GCM for encrypt_bulk() / store_secrets()
         """
         self.key_file = Path(key_file)
-        self.key = self._load_or_create_key()
-        self.cipher = Fernet(self.key)
+        with _CACHE_LOCK:
+            cache_key = self.key_file.resolve()
+            cached = _KEY_CACHE.get(cache_key)
+            # A deleted or rotated key file must not live on in memory
+            if cached is None or cached[0] != _key_mtime(self.key_file):
+                key = self._load_or_create_key()
+                cached = _KEY_CACHE[cache_key] = (_key_mtime(self.key_file), key, Fernet(key))
+            self._key_mtime, self.key, self.cipher = cached
+        
+        # AES-GCM runs on the CPU's AES-NI/PCLMULQDQ instructions and skips
+        # Fernet's separate HMAC pass and base64 of every token. Its key is
+        # derived from the vault key, so there is still only one key file
+        self._aead = None
+        if fast:
+            key32 = HKDF(algorithm=hashes.SHA256(), length=32, salt=None,
+                         info=b'SecretVault AES-GCM').derive(base64.urlsafe_b64decode(self.key))
+            self._aead = AESGCM(key32)
+        
+        # Parsed vault file, reused until the file changes on disk
+        self._vault = None
+        self._vault_file = None
+        self._vault_mtime = None
+        self._dirty = False
+        self._batch = False
+    
+    @classmethod
+    def shared(cls, key_file: str = '.vault_key', fast: bool = False) -> 'SecretVault':
+        """
+        Get the process-wide vault for a key file, creating it on first use
+        
+        Args:
+            key_file: Path to encryption key file
+            fast: Also set up AES-GCM for encrypt_bulk() / store_secrets()
+        """
+        with _CACHE_LOCK:
+            cache_key = (Path(key_file).resolve(), fast)
+            vault = _SHARED_VAULTS.get(cache_key)
+            # Replaced once the key file changes, like the key cache entry
+            if vault is None or vault._key_mtime != _key_mtime(vault.key_file):
+                vault = _SHARED_VAULTS[cache_key] = cls(key_file, fast=fast)
+            return vault
+    
+    def __enter__(self):
+        """Batch mode: stores are written once, when the block exits"""
+        self._batch = True
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self._batch = False
+        self.flush()
     
     def _load_or_create_key(self) -> bytes:
         """Load existing key or create new one"""
@@ -76,35 +154,125 @@ class SecretVault:
         Returns:
             The decrypted secret
         """
+        if encrypted_secret.startswith(self.GCM_PREFIX):
+            if self._aead is None:
+                raise ValueError("AES-GCM secret - open the vault with fast=True")
+            raw = base64.b64decode(encrypted_secret[len(self.GCM_PREFIX):])
+            return self._aead.decrypt(raw[:12], raw[12:], None).decode()
+        
         decrypted = self.cipher.decrypt(encrypted_secret.encode())
         return decrypted.decode()
     
+    def encrypt_bulk(self, pairs: list) -> dict:
+        """
+        Encrypt many secrets with AES-GCM (needs fast=True)
+        
+        Args:
+            pairs: (name, secret) tuples
+        
+        Returns:
+            {name: encrypted secret}, each a "gcm:" + base64(nonce + ciphertext) token
+        """
+        if self._aead is None:
+            raise ValueError("encrypt_bulk needs the vault opened with fast=True")
+        
+        encrypted = {}
+        for name, secret in pairs:
+            nonce = os.urandom(12)
+            token = nonce + self._aead.encrypt(nonce, secret.encode(), None)
+            encrypted[name] = self.GCM_PREFIX + base64.b64encode(token).decode()
+        return encrypted
+    
+    def _load_vault(self, vault_file: str) -> dict:
+        """
+        Return the parsed vault, reading the file only when needed
+        
+        Args:
+            vault_file: File containing encrypted secrets
+        
+        Returns:
+            The vault dict ({name: encrypted secret})
+        """
+        vault_path = Path(vault_file)
+        if self._vault_file != vault_path:
+            # Switching files - write out anything pending for the old one
+            self.flush()
+            self._vault = None
+            self._vault_file = vault_path
+        
+        if self._dirty:
+            # Unsaved stores are newer than the file
+            return self._vault
+        
+        try:
+            mtime = vault_path.stat().st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        
+        if self._vault is None or mtime != self._vault_mtime:
+            if mtime is None:
+                self._vault = {}
+            else:
+                with open(vault_path, 'rb') as f:
+                    data = f.read()
+                self._vault = orjson.loads(data) if orjson else json.loads(data)
+            self._vault_mtime = mtime
+        
+        return self._vault
+    
+    def flush(self):
+        """Write pending secrets to the vault file (no-op if nothing changed)"""
+        if not self._dirty:
+            return
+        
+        if orjson:
+            data = orjson.dumps(self._vault, option=orjson.OPT_INDENT_2)
+        else:
+            data = json.dumps(self._vault, indent=2).encode()
+        with open(self._vault_file, 'wb') as f:
+            f.write(data)
+        
+        self._vault_mtime = self._vault_file.stat().st_mtime_ns
+        self._dirty = False
+    
     def store_secret(self, name: str, value: str, vault_file: str = 'vault.json'):
         """
         Encrypt and store a secret
         
+        Written to disk straight away, or once at the end of a
+        `with vault:` block when storing many secrets.
+        
         Args:
             name: Secret name
             value: Secret value
             vault_file: File to store encrypted secrets
         """
-        vault_path = Path(vault_file)
-        
-        # Load existing vault or create new
-        if vault_path.exists():
-            with open(vault_path, 'r') as f:
-                vault = json.load(f)
-        else:
-            vault = {}
+        vault = self._load_vault(vault_file)
         
         # Encrypt and store
         vault[name] = self.encrypt(value)
-        
-        with open(vault_path, 'w') as f:
-            json.dump(vault, f, indent=2)
+        self._dirty = True
+        if not self._batch:
+            self.flush()
         
         print(f"✅ Stored encrypted secret: {name}")
     
+    def store_secrets(self, pairs: list, vault_file: str = 'vault.json'):
+        """
+        Encrypt many secrets with encrypt_bulk() and write the vault once
+        
+        Args:
+            pairs: (name, secret) tuples
+            vault_file: File to store encrypted secrets
+        """
+        vault = self._load_vault(vault_file)
+        vault.update(self.encrypt_bulk(pairs))
+        self._dirty = True
+        if not self._batch:
+            self.flush()
+        
+        print(f"✅ Stored {len(pairs)} encrypted secrets")
+    
     def retrieve_secret(self, name: str, vault_file: str = 'vault.json') -> str:
         """
         Retrieve and decrypt a secret
@@ -116,14 +284,11 @@ class SecretVault:
         Returns:
             Decrypted secret
         """
-        vault_path = Path(vault_file)
+        vault = self._load_vault(vault_file)
         
-        if not vault_path.exists():
+        if not vault and self._vault_mtime is None:
             raise FileNotFoundError(f"Vault file not found: {vault_file}")
         
-        with open(vault_path, 'r') as f:
-            vault = json.load(f)
-        
         if name not in vault:
             raise KeyError(f"Secret not found: {name}")
         
@@ -140,10 +305,11 @@ if __name__ == "__main__":
     # Initialize vault
     vault = SecretVault('.vault_key')
     
-    # Store some secrets
+    # Store some secrets (written to vault.json once, at the end of the block)
     print("📝 Storing secrets...")
-    vault.store_secret('stripe_api_key', 'sk_live_example_key_12345')
-    vault.store_secret('database_password', 'super_secure_password_789')
+    with vault:
+        vault.store_secret('stripe_api_key', 'sk_live_example_key_12345')
+        vault.store_secret('database_password', 'super_secure_password_789')
     
     # Retrieve secrets
     print("\n🔓 Retrieving secrets...")
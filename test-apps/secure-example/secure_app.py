@@ -6,12 +6,26 @@ Compare this with test-apps/vulnerable-app/app.py to see the difference.
 """
 
 import os
-from pathlib import Path
 
 # ════════════════════════════════════════════════════════════════════
 # ✅ CORRECT METHOD 1: Environment Variables
 # ════════════════════════════════════════════════════════════════════
 
+# Snapshot of the environment - a plain dict lookup per secret instead of
+# os.getenv's extra call and key encoding; read it rather than os.environ
+_ENV_CACHE = dict(os.environ)
+
+
+def refresh_env_cache():
+    """Re-read the environment (e.g. from a SIGHUP handler after rotating secrets)"""
+    global _ENV_CACHE, _STRIPE_API_KEY
+    _ENV_CACHE = dict(os.environ)
+    _STRIPE_API_KEY = _ENV_CACHE.get('STRIPE_API_KEY')
+    # Forget resolved secrets so __getattr__ reads them again
+    for name in _SECRET_ENV_NAMES:
+        globals().pop(name, None)
+
+
 def get_secret_from_env(secret_name: str, required: bool = True) -> str:
     """
     Securely retrieve secrets from environment variables
@@ -26,7 +40,7 @@ def get_secret_from_env(secret_name: str, required: bool = True) -> str:
     Raises:
         ValueError: If required secret is missing
     """
-    secret = os.getenv(secret_name)
+    secret = _ENV_CACHE.get(secret_name)
     
     if required and not secret:
         raise ValueError(
@@ -37,10 +51,28 @@ def get_secret_from_env(secret_name: str, required: bool = True) -> str:
     return secret
 
 
-# ✅ CORRECT: Get secrets from environment
-API_KEY = get_secret_from_env('STRIPE_API_KEY', required=False)
-DATABASE_PASSWORD = get_secret_from_env('DATABASE_PASSWORD', required=False)
-SECRET_KEY = get_secret_from_env('FLASK_SECRET_KEY', required=False)
+# ✅ CORRECT: Get secrets from environment - on first use, then kept as
+# plain module attributes (module attribute -> environment variable)
+_SECRET_ENV_NAMES = {
+    'API_KEY': 'STRIPE_API_KEY',
+    'DATABASE_PASSWORD': 'DATABASE_PASSWORD',
+    'SECRET_KEY': 'FLASK_SECRET_KEY',
+}
+
+
+def __getattr__(name: str):
+    """Resolve API_KEY, DATABASE_PASSWORD and SECRET_KEY lazily (PEP 562)"""
+    env_name = _SECRET_ENV_NAMES.get(name)
+    if env_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = globals()[name] = _ENV_CACHE.get(env_name)
+    return value
+
+# Resolved once for process_payment (and again by refresh_env_cache)
+_STRIPE_API_KEY = _ENV_CACHE.get('STRIPE_API_KEY')
+
+# Secrets the app refuses to start without
+REQUIRED_SECRETS = frozenset({'STRIPE_API_KEY', 'DATABASE_PASSWORD'})
 
 
 # ════════════════════════════════════════════════════════════════════
@@ -48,6 +80,26 @@ SECRET_KEY = get_secret_from_env('FLASK_SECRET_KEY', required=False)
 # ════════════════════════════════════════════════════════════════════
 
 import json
+import mmap
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _parse_json(buf) -> dict:
+    """Parse JSON from a bytes-like buffer (with orjson when it is installed)"""
+    if orjson:
+        # orjson reads the buffer in place - no copy of the mapped pages
+        with memoryview(buf) as view:
+            return orjson.loads(view)
+    return json.loads(bytes(buf))  # stdlib json needs real bytes
+
+
+# filepath -> (st_mtime_ns, parsed secrets), so repeat loads skip the parse
+_SECRETS_CACHE = {}
+
 
 def load_secrets_from_file(filepath: str = 'secrets.json') -> dict:
     """
@@ -55,21 +107,43 @@ def load_secrets_from_file(filepath: str = 'secrets.json') -> dict:
     
     IMPORTANT: Add secrets.json to .gitignore!
     
+    The parsed file is cached until its modification time changes; each
+    call gets its own copy, so callers may modify the result freely.
+    
     Args:
         filepath: Path to secrets file
     
     Returns:
         Dictionary of secrets
     """
-    secrets_path = Path(filepath)
-    
-    if not secrets_path.exists():
+    try:
+        st = os.stat(filepath)
+    except FileNotFoundError:
         print(f"⚠️  Secrets file not found: {filepath}")
         print(f"Create it from secrets.example.json template")
         return {}
     
-    with open(secrets_path, 'r') as f:
-        return json.load(f)
+    cached = _SECRETS_CACHE.get(filepath)
+    if cached and cached[0] == st.st_mtime_ns:
+        return cached[1].copy()
+    
+    with open(filepath, 'rb') as f:
+        if st.st_size == 0:
+            secrets = _parse_json(b'')  # mmap can't map an empty file; raises like json.load
+        else:
+            # Parse straight from the mapped pages instead of a text-mode read
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+                secrets = _parse_json(buf)
+    _SECRETS_CACHE[filepath] = (st.st_mtime_ns, secrets)
+    return secrets.copy()
+
+
+def invalidate_secrets_cache(filepath: str = None):
+    """Forget the cached secrets for one file, or for all files"""
+    if filepath is None:
+        _SECRETS_CACHE.clear()
+    else:
+        _SECRETS_CACHE.pop(filepath, None)
 
 
 # ✅ Load from secure config file
@@ -141,19 +215,21 @@ from flask import Flask
 
 app = Flask(__name__)
 
-# ✅ CORRECT: Secret from environment
-app.config['SECRET_KEY'] = os.getenv('FLASK_SECRET_KEY', 'dev-only-key')
-
-# ✅ CORRECT: Database URL from environment
-app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv(
-    'DATABASE_URL',
-    'sqlite:///dev.db'  # Default for development only
+app.config.from_mapping(
+    # ✅ CORRECT: Secret from environment
+    SECRET_KEY=_ENV_CACHE.get('FLASK_SECRET_KEY', 'dev-only-key'),
+    # ✅ CORRECT: Database URL from environment
+    SQLALCHEMY_DATABASE_URI=_ENV_CACHE.get(
+        'DATABASE_URL',
+        'sqlite:///dev.db'  # Default for development only
+    ),
 )
 
 @app.route('/api/payment')
 def process_payment():
-    # ✅ CORRECT: API key loaded from environment
-    api_key = get_secret_from_env('STRIPE_API_KEY')
+    # ✅ CORRECT: API key resolved from the environment at startup, not per
+    # request (get_secret_from_env is only reached to raise the "not set" error)
+    api_key = _STRIPE_API_KEY or get_secret_from_env('STRIPE_API_KEY')
     
     # Use the API key securely
     # Never log or return it in responses
@@ -161,9 +237,10 @@ def process_payment():
 
 
 if __name__ == '__main__':
-    # ✅ Verify all required secrets are present
-    required_secrets = ['STRIPE_API_KEY', 'DATABASE_PASSWORD']
-    missing = [s for s in required_secrets if not os.getenv(s)]
+    # ✅ Verify all required secrets are present: unset ones in one set
+    # difference, plus ones set to an empty string (deliberately missing too)
+    present = REQUIRED_SECRETS & _ENV_CACHE.keys()
+    missing = sorted((REQUIRED_SECRETS - present) | {name for name in present if not _ENV_CACHE[name]})
     
     if missing:
         print(f"❌ Missing required secrets: {', '.join(missing)}")